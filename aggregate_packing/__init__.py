@@ -0,0 +1,10 @@
+"""
+Core of the aggregate packing simulation: aggregate geometry, packing metrics, run I/O and
+replicate statistics, depending only on NumPy. The Blender side lives in
+aggregate_packing.blender, which imports bpy lazily and is only used by the scripts that run
+inside Blender.
+"""
+from .geometry import aggregate_positions, distribute_on_sphere
+from .metrics import bounding_sphere, max_distance_from_center, mesh_volume, packing_fraction, sphere_volume
+from .results import load_dataset, load_run_summaries, parse_run_name, read_run_csv, run_name, update_dataset
+from .stats import RunningStats
@@ -0,0 +1,157 @@
+"""
+Blender adapter: scene setup, mesh creation and mesh data extraction.
+
+bpy is imported inside each function, so this module (and the rest of the package) can be
+imported by plain Python; the functions themselves only work when running inside Blender.
+"""
+import numpy as np
+
+from .metrics import mesh_volume
+
+
+### Cleaning the Scene
+
+def delete_all_objects():
+    import bpy
+    bpy.ops.object.select_all(action='SELECT')
+    bpy.ops.object.delete(use_global=False)
+
+def purge_orphans():
+    import bpy
+    if bpy.app.version >= (3, 0, 0):
+        bpy.ops.outliner.orphans_purge(
+            do_local_ids=True, do_linked_ids=True, do_recursive=True
+        )
+    else:
+        # call purge_orphans() recursively until there are no more orphan data blocks to purge
+        result = bpy.ops.outliner.orphans_purge()
+        if result.pop() != "CANCELLED":
+            purge_orphans()
+
+def clean_scene():
+    """
+    Removing all of the objects, collection, materials, particles,
+    textures, images, curves, meshes, actions, nodes, and worlds from the scene
+    """
+    import bpy
+    if bpy.context.active_object and bpy.context.active_object.mode == "EDIT":
+        bpy.ops.object.editmode_toggle()
+
+    for obj in bpy.data.objects:
+        obj.hide_set(False)
+        obj.hide_select = False
+        obj.hide_viewport = False
+
+    bpy.ops.object.select_all(action="SELECT")
+    bpy.ops.object.delete()
+
+    collection_names = [col.name for col in bpy.data.collections]
+    for name in collection_names:
+        bpy.data.collections.remove(bpy.data.collections[name])
+
+    # in the case when you modify the world shader
+    world_names = [world.name for world in bpy.data.worlds]
+    for name in world_names:
+        bpy.data.worlds.remove(bpy.data.worlds[name])
+    # create a new world data block
+    bpy.ops.world.new()
+    bpy.context.scene.world = bpy.data.worlds["World"]
+
+    purge_orphans()
+
+
+### Building aggregates
+
+def create_sphere(location, radius=1):
+    import bpy
+    bpy.ops.mesh.primitive_uv_sphere_add(radius=radius, location=tuple(map(float, location)))
+    sphere = bpy.context.object
+    return sphere
+
+def join_spheres(positions, radius):
+    # Creates a sphere at each position and joins them into a single aggregate mesh
+    import bpy
+    spheres = [create_sphere(pos, radius) for pos in positions]
+
+    bpy.ops.object.select_all(action='DESELECT')
+    for sphere in spheres:
+        sphere.select_set(True)
+
+    bpy.context.view_layer.objects.active = spheres[0]
+    bpy.ops.object.join()  # Join all selected spheres into one mesh
+
+    return bpy.context.view_layer.objects.active
+
+def generate_force_field(strength):
+    import bpy
+    bpy.context.scene.gravity = (0, 0, 0)
+
+    # Create a new force field object at the origin
+    bpy.ops.object.effector_add(type='FORCE', location=(0, 0, 0))
+
+    # Get the force field object
+    force_field = bpy.context.object
+
+    # Set the strength of the force field (negative values attract)
+    force_field.field.strength = strength
+
+    # Set the maximum distance of the force field's effect (0 means no maximum)
+    force_field.field.distance_max = 0.0
+
+    return force_field
+
+
+### Reading meshes
+
+def mesh_objects():
+    import bpy
+    return [obj for obj in bpy.data.objects if obj.type == 'MESH']
+
+def _vertices(mesh):
+    co = np.empty(len(mesh.vertices) * 3)
+    mesh.vertices.foreach_get('co', co)
+    return co.reshape(-1, 3)
+
+def _to_world(obj, points):
+    matrix = np.array(obj.matrix_world)
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+def object_points(objects, mode='GEOMETRY', space='WORLD'):
+    """
+    Stacks the points of objects into an (N, 3) array.
+    GEOMETRY - by all vertices - more precise, slower
+    BBOX - by object bounding box corners - less precise, quick
+    space='LOCAL' leaves the points in each object's own coordinates.
+    """
+    chunks = []
+    for obj in objects:
+        points = _vertices(obj.data) if mode == 'GEOMETRY' else np.array(obj.bound_box, dtype=float)
+        chunks.append(_to_world(obj, points) if space == 'WORLD' else points)
+    return np.concatenate(chunks) if chunks else np.zeros((0, 3))
+
+def aggregate_volume(objects):
+    total_volume = 0
+    for obj in objects:
+        if obj.data is not None:
+            mesh = obj.data
+            mesh.update()
+            mesh.calc_loop_triangles()
+            triangles = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+            mesh.loop_triangles.foreach_get('vertices', triangles)
+            total_volume += mesh_volume(_vertices(mesh), triangles.reshape(-1, 3))
+    return total_volume
+
+
+### Exporting to obj file
+
+def export_to_obj(obj_filename):
+    import bpy
+    # Deselect all objects
+    bpy.ops.object.select_all(action='DESELECT')
+
+    # Select all mesh objects
+    for obj in mesh_objects():
+        obj.select_set(True)
+
+    # Export selected objects as a single .obj file
+    bpy.ops.export_scene.obj(filepath=obj_filename, use_selection=True)
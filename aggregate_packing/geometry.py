@@ -0,0 +1,57 @@
+import math
+import random
+
+import numpy as np
+
+
+### Generating aggregates
+
+def random_unit_vector(rng=random):
+    theta = rng.uniform(0, 2 * math.pi)
+    phi = rng.uniform(0, math.pi)
+    x = math.sin(phi) * math.cos(theta)
+    y = math.sin(phi) * math.sin(theta)
+    z = math.cos(phi)
+    return np.array([x, y, z])
+
+def find_new_position(positions, radius, jump_chance=None, rng=random):
+    # jump_chance=None grows from any sphere at random; otherwise growth continues from the
+    # last placed sphere except with probability jump_chance, when it jumps to an earlier one
+    if jump_chance is None:
+        base_pos = rng.choice(positions)
+    elif len(positions) > 1 and rng.random() < jump_chance:
+        base_pos = rng.choice(positions[:-1])  # Choose a random previous sphere, not the last one
+    else:
+        base_pos = positions[-1]  # Choose the last placed sphere
+
+    direction = random_unit_vector(rng)
+    new_pos = base_pos + direction * 2 * radius
+    return new_pos
+
+def overlaps(new_pos, positions, radius):
+    return bool(np.any(np.linalg.norm(np.asarray(positions) - new_pos, axis=1) < 2 * radius))
+
+def aggregate_positions(center, radius, num_spheres, jump_chance=None, rng=random):
+    # Centers of num_spheres touching, non-overlapping spheres grown outwards from center
+    positions = [np.asarray(center, dtype=float)]
+
+    for _ in range(1, num_spheres):
+        while True:
+            new_pos = find_new_position(positions, radius, jump_chance, rng)
+            if not overlaps(new_pos, positions, radius):
+                positions.append(new_pos)
+                break
+
+    return positions
+
+def distribute_on_sphere(n, r):
+    indices = np.arange(0, n, dtype=float) + 0.5
+
+    phi = (np.sqrt(5.0) - 1.0) / 2.0  # golden ratio
+    y = 2*r * (1 - (indices / n)) - r  # y varies from -r to r
+    radius = np.sqrt(r*r - y*y)  # radius at y
+    theta = 2 * np.pi * phi * indices
+
+    x, z = radius * np.cos(theta), radius * np.sin(theta)
+
+    return list(zip(x, y, z))  # return as a list of tuples
@@ -0,0 +1,31 @@
+from math import pi
+
+import numpy as np
+
+
+### Packing metrics
+
+def bounding_sphere(points):
+    # Sphere centered on the middle of the points' axis-aligned extent, reaching the farthest point
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    if len(points) == 0:
+        return None, None
+    center = (points.max(axis=0) + points.min(axis=0)) / 2
+    radius = max_distance_from_center(points, center)
+    return center, radius
+
+def max_distance_from_center(points, center):
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    return float(np.linalg.norm(points - center, axis=1).max())
+
+def sphere_volume(radius):
+    return (4/3)*pi*(radius**3)
+
+def packing_fraction(aggregate_volume, bounding_radius):
+    return aggregate_volume / sphere_volume(bounding_radius)
+
+def mesh_volume(vertices, triangles):
+    # Volume enclosed by a closed triangle mesh (divergence theorem), as bmesh's calc_volume()
+    corners = np.asarray(vertices, dtype=float)[np.asarray(triangles)]
+    signed = np.einsum('ij,ij->i', corners[:, 0], np.cross(corners[:, 1], corners[:, 2])).sum() / 6
+    return abs(float(signed))
@@ -0,0 +1,265 @@
+import csv
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+
+### Run naming
+
+# Sweep outputs from parametric_study.py, e.g. aggregate_data_Np_5_Na_500_jc0p25
+# and single runs from calculate_packing.py, e.g. 0.01radius_5particles_50aggregates
+RUN_NAME_PATTERNS = [
+    re.compile(r'aggregate_data_Np_(?P<num_primary_particles>\d+)_Na_(?P<num_aggregates>\d+)_jc(?P<jump_chance>\d+(?:p\d+)?)'),
+    re.compile(r'(?P<primary_particle_radius>\d+(?:[.p]\d+)?)radius_(?P<num_primary_particles>\d+)particles_(?P<num_aggregates>\d+)aggregates'),
+]
+
+SEED_PATTERN = re.compile(r'_seed(?P<seed>\d+)$')
+
+PARAMETER_COLUMNS = ['primary_particle_radius', 'num_primary_particles', 'num_aggregates', 'jump_chance']
+FRAME_COLUMNS = ['time', 'aggregate_volume', 'bounding_radius', 'packing_fraction', 'max_radius']
+SUMMARY_COLUMNS = [
+    'run_id', *PARAMETER_COLUMNS, 'seed', 'n_frames', 'final_packing_fraction', 'converged_packing_fraction',
+    'convergence_frame', 'n_replicates', 'replicate_mean', 'replicate_std',
+]
+
+def run_name(n_primary, n_aggregates, j_chance, seed=None):
+    name = 'aggregate_data_Np_{npp}_Na_{na}_jc{jc}'.format(npp=n_primary, na=n_aggregates, jc=j_chance)
+    if seed is not None:
+        name += '_seed{seed}'.format(seed=seed)
+    return name.replace('.', 'p')
+
+def ensemble_name(n_primary, n_aggregates, j_chance):
+    # Name of the per-configuration summary of all its replicates
+    return 'ensemble_Np_{npp}_Na_{na}_jc{jc}'.format(npp=n_primary, na=n_aggregates, jc=j_chance).replace('.', 'p')
+
+def parse_run_name(run_id):
+    # Returns the sweep parameters and replicate seed encoded in a run's file name (NaN when not encoded)
+    params = {name: np.nan for name in PARAMETER_COLUMNS}
+    params['seed'] = np.nan
+    for pattern in RUN_NAME_PATTERNS:
+        match = pattern.search(run_id)
+        if match:
+            for name, value in match.groupdict().items():
+                params[name] = float(value.replace('p', '.'))
+            break
+    match = SEED_PATTERN.search(run_id)
+    if match:
+        params['seed'] = float(match.group('seed'))
+    return params
+
+
+### Reading runs
+
+def read_run_csv(csv_filename):
+    """
+    Streams one run's CSV into per-column arrays; columns missing from older outputs are NaN.
+    packing_fraction is always returned as a plain fraction: calculate_packing.py writes a
+    packing_percentage column instead, and its older outputs wrote percentages under the
+    packing_fraction name, which are recognised by exceeding 1 (a physical fraction cannot).
+    """
+    columns = {name: [] for name in FRAME_COLUMNS}
+    is_percentage = False
+    with open(csv_filename, newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        if reader.fieldnames and 'packing_percentage' in reader.fieldnames:
+            is_percentage = True
+        for row in reader:
+            if is_percentage:
+                row['packing_fraction'] = row.get('packing_percentage')
+            for name in FRAME_COLUMNS:
+                value = row.get(name)
+                columns[name].append(float(value) if value not in (None, '') else np.nan)
+    columns = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+    if is_percentage or np.nanmax(columns['packing_fraction'], initial=0) > 1:
+        columns['packing_fraction'] = columns['packing_fraction'] / 100
+    return columns
+
+def convergence_frame(packing_fraction, rtol=0.01):
+    # Index of the first frame after which the packing fraction stays within rtol of its final value
+    if len(packing_fraction) == 0:
+        return -1
+    final = packing_fraction[-1]
+    deviation = np.abs(packing_fraction - final)
+    tail_max = np.maximum.accumulate(deviation[::-1])[::-1]  # worst deviation from each frame onwards
+    return int(np.argmax(tail_max <= rtol * abs(final)))
+
+def converged_packing_fraction(packing_fraction, rtol=0.01):
+    # Mean packing fraction over the frames from convergence_frame onwards
+    i_converged = convergence_frame(packing_fraction, rtol)
+    return np.mean(packing_fraction[i_converged:]) if i_converged >= 0 else np.nan
+
+def summarize_run(run_id, frames, rtol=0.01):
+    packing_fraction = frames['packing_fraction']
+    i_converged = convergence_frame(packing_fraction, rtol)
+    summary = {'run_id': run_id, **parse_run_name(run_id), 'n_frames': len(packing_fraction)}
+    if i_converged < 0:
+        summary.update(final_packing_fraction=np.nan, converged_packing_fraction=np.nan, convergence_frame=np.nan)
+    else:
+        summary.update(
+            final_packing_fraction=packing_fraction[-1],
+            converged_packing_fraction=converged_packing_fraction(packing_fraction, rtol),
+            convergence_frame=frames['time'][i_converged],
+        )
+    return summary
+
+def add_replicate_statistics(summaries):
+    # Runs sharing every sweep parameter are replicates of the same configuration, whatever their seed
+    groups = {}
+    for summary in summaries:
+        key = tuple(summary[name] for name in PARAMETER_COLUMNS)
+        key = tuple('nan' if np.isnan(value) else value for value in key)
+        groups.setdefault(key, []).append(summary)
+
+    for replicates in groups.values():
+        values = np.array([summary['converged_packing_fraction'] for summary in replicates])
+        values = values[~np.isnan(values)]
+        mean = np.mean(values) if len(values) else np.nan
+        std = np.std(values, ddof=1) if len(values) > 1 else np.nan
+        for summary in replicates:
+            summary.update(n_replicates=len(values), replicate_mean=mean, replicate_std=std)
+    return summaries
+
+
+### Columnar dataset
+
+# A dataset directory holds one .npy file per column under frames/ (one row per run-frame),
+# runs.csv with one summary row per run, and manifest.json recording which files were ingested.
+# Bump SCHEMA_VERSION whenever the columns or their meaning change; datasets written under
+# another version are rebuilt from the CSVs on the next update.
+# Updates write a complete new copy next to the dataset (<dataset_dir>.tmp) and swap it in with
+# two renames, parking the previous copy at <dataset_dir>.old meanwhile, so an interrupted update
+# never leaves columns of different lengths behind.
+SCHEMA_VERSION = 1
+
+def _current_dir(dataset_dir):
+    # The previous copy stands in when an update was interrupted between its two renames
+    old_dir = dataset_dir + '.old'
+    return old_dir if not os.path.isdir(dataset_dir) and os.path.isdir(old_dir) else dataset_dir
+
+def _recover(dataset_dir):
+    # Puts the previous copy back after an interrupted swap and discards leftover copies
+    old_dir = dataset_dir + '.old'
+    if not os.path.isdir(dataset_dir) and os.path.isdir(old_dir):
+        os.rename(old_dir, dataset_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    shutil.rmtree(dataset_dir + '.tmp', ignore_errors=True)
+
+def _load_manifest(dataset_dir):
+    # Returns the ingested files, or None when the dataset is missing or has an outdated schema
+    manifest_filename = os.path.join(dataset_dir, 'manifest.json')
+    if not os.path.exists(manifest_filename):
+        return None
+    with open(manifest_filename) as f:
+        manifest = json.load(f)
+    if manifest.get('schema_version') != SCHEMA_VERSION:
+        return None
+    return manifest['files']
+
+def load_dataset(dataset_dir, columns=None, mmap_mode='r'):
+    # Loads frame columns as arrays; memory mapped by default so selecting a few columns is cheap
+    frames_dir = os.path.join(_current_dir(dataset_dir), 'frames')
+    if not os.path.isdir(frames_dir):
+        return {}
+    if columns is None:
+        columns = [name[:-len('.npy')] for name in sorted(os.listdir(frames_dir)) if name.endswith('.npy')]
+    return {name: np.load(os.path.join(frames_dir, name + '.npy'), mmap_mode=mmap_mode) for name in columns}
+
+def load_run_summaries(dataset_dir):
+    summaries = []
+    runs_filename = os.path.join(_current_dir(dataset_dir), 'runs.csv')
+    if not os.path.exists(runs_filename):
+        return summaries
+    with open(runs_filename, newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            summaries.append({name: (value if name == 'run_id' else float(value)) for name, value in row.items()})
+    return summaries
+
+def _write_dataset(dataset_dir, columns, summaries, manifest):
+    staging_dir = dataset_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    frames_dir = os.path.join(staging_dir, 'frames')
+    os.makedirs(frames_dir)
+    for name, values in columns.items():
+        np.save(os.path.join(frames_dir, name + '.npy'), values)
+
+    with open(os.path.join(staging_dir, 'runs.csv'), 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow(summary)
+
+    with open(os.path.join(staging_dir, 'manifest.json'), 'w') as f:
+        json.dump({'schema_version': SCHEMA_VERSION, 'files': manifest}, f, indent=1, sort_keys=True)
+
+    old_dir = dataset_dir + '.old'
+    if os.path.isdir(dataset_dir):
+        os.rename(dataset_dir, old_dir)
+    os.rename(staging_dir, dataset_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def update_dataset(results_dir, dataset_dir, rtol=0.01):
+    """
+    Ingests every run CSV in results_dir that is new or has changed since the last update
+    and appends it to the columnar dataset in dataset_dir, dropping runs whose CSV was deleted.
+    Returns the list of ingested run ids.
+
+    Only the CSV parsing is incremental: every update that finds a change loads the whole
+    dataset into memory and writes a complete new copy of it.
+    """
+    _recover(dataset_dir)
+    manifest = _load_manifest(dataset_dir)
+    rebuild = manifest is None  # Start over so no column from an older schema survives
+    if rebuild:
+        manifest = {}
+
+    # Runs whose CSV has been deleted are dropped from the dataset
+    deleted = [name for name in manifest if not os.path.exists(os.path.join(results_dir, name))]
+    for name in deleted:
+        del manifest[name]
+
+    pending = {}
+    for name in sorted(os.listdir(results_dir)):
+        if not name.endswith('.csv'):
+            continue
+        stat = os.stat(os.path.join(results_dir, name))
+        signature = {'mtime': stat.st_mtime, 'size': stat.st_size}
+        if manifest.get(name) != signature:
+            pending[name] = signature
+
+    if not pending and not deleted:
+        return []
+
+    stale_ids = {os.path.splitext(name)[0] for name in [*pending, *deleted]}
+
+    # Keep rows of runs that have not changed, drop those that are being re-ingested
+    # Not memory mapped, so no file stays open while the dataset directory is swapped
+    columns = {} if rebuild else load_dataset(dataset_dir, mmap_mode=None)
+    if columns:
+        keep = ~np.isin(columns['run_id'], list(stale_ids))
+        columns = {name: values[keep] for name, values in columns.items()}
+    summaries = [] if rebuild else load_run_summaries(dataset_dir)
+    summaries = [summary for summary in summaries if summary['run_id'] not in stale_ids]
+
+    new_columns = {name: [values] for name, values in columns.items()}
+    for name, signature in pending.items():
+        run_id = os.path.splitext(name)[0]
+        frames = read_run_csv(os.path.join(results_dir, name))
+        n_frames = len(frames['time'])
+        params = parse_run_name(run_id)
+
+        run_columns = {'run_id': np.full(n_frames, run_id)}
+        run_columns.update({param: np.full(n_frames, value) for param, value in params.items()})
+        run_columns.update(frames)
+        for column, values in run_columns.items():
+            new_columns.setdefault(column, []).append(values)
+
+        summaries.append(summarize_run(run_id, frames, rtol))
+        manifest[name] = signature
+
+    columns = {name: np.concatenate(values) for name, values in new_columns.items()}
+    summaries = add_replicate_statistics(summaries)
+    _write_dataset(dataset_dir, columns, summaries, manifest)
+    return sorted(os.path.splitext(name)[0] for name in pending)
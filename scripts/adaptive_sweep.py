@@ -0,0 +1,235 @@
+import csv
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from aggregate_packing.results import ensemble_name
+from ensemble_study import run_ensembles, write_ensemble_csv
+
+
+### Surrogate
+
+class Surrogate:
+    """
+    Gaussian process regression of converged packing fraction over the normalized parameter cube.
+    The length scale is picked from a few candidates by marginal likelihood, and each point's
+    replicate variance of the mean is used as its observation noise.
+    """
+
+    def __init__(self, length_scales=(0.15, 0.3, 0.6), jitter=1e-6):
+        self.length_scales = length_scales
+        self.jitter = jitter
+
+    @staticmethod
+    def _kernel(a, b, length_scale):
+        d2 = ((a[:, None, :] - b[None, :, :])**2).sum(axis=-1)
+        return np.exp(-0.5 * d2 / length_scale**2)
+
+    def fit(self, x, y, noise_var):
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean = y.mean()
+        self.y_scale = y.std() if y.std() > 0 else 1.0
+        y_norm = (y - self.y_mean) / self.y_scale
+        noise = np.nan_to_num(np.asarray(noise_var, dtype=float)) / self.y_scale**2 + self.jitter
+
+        best_lml = -np.inf
+        for length_scale in self.length_scales:
+            K = self._kernel(self.x, self.x, length_scale) + np.diag(noise)
+            L = np.linalg.cholesky(K)
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, y_norm))
+            lml = -0.5 * y_norm @ alpha - np.log(np.diag(L)).sum()
+            if lml > best_lml:
+                best_lml = lml
+                self.length_scale, self.L, self.alpha = length_scale, L, alpha
+        return self
+
+    def predict(self, x):
+        # Returns the posterior mean and standard deviation at x
+        k = self._kernel(np.asarray(x, dtype=float), self.x, self.length_scale)
+        mean = k @ self.alpha
+        v = np.linalg.solve(self.L, k.T)
+        var = np.clip(1.0 - (v**2).sum(axis=0), 0.0, None)
+        return self.y_mean + self.y_scale * mean, self.y_scale * np.sqrt(var)
+
+
+### Choosing points
+
+def coarse_grid(axes, levels=2):
+    # Evenly spaced subset of each axis' allowed values (levels=2 gives the corners of the box)
+    picks = [sorted({values[int(round(i))] for i in np.linspace(0, len(values) - 1, levels)}) for values in axes]
+    return list(itertools.product(*picks))
+
+def normalize(points, axes):
+    lo = np.array([min(values) for values in axes], dtype=float)
+    hi = np.array([max(values) for values in axes], dtype=float)
+    span = np.where(hi > lo, hi - lo, 1.0)
+    return (np.asarray(points, dtype=float) - lo) / span
+
+def acquisition(surrogate, axes, uncertainty_weight=1.0):
+    """
+    Scores every point of the candidate lattice by the surrogate's gradient magnitude plus its
+    uncertainty, each scaled to [0, 1], so new runs go where the response is steep or poorly known.
+    """
+    lattice = list(itertools.product(*axes))
+    mean, std = surrogate.predict(normalize(lattice, axes))
+
+    shape = tuple(len(values) for values in axes)
+    mean_grid = mean.reshape(shape)
+    coordinates = [normalize(np.array(values)[:, None], [values])[:, 0] for values in axes]
+    # np.gradient needs at least two values along an axis; a fixed parameter contributes no slope
+    gradients = [np.gradient(mean_grid, c, axis=i) if len(c) > 1 else np.zeros(shape) for i, c in enumerate(coordinates)]
+    grad_norm = np.sqrt(sum(g**2 for g in gradients)).ravel()
+
+    def scaled(values):
+        return values / values.max() if values.max() > 0 else values
+
+    return lattice, scaled(grad_norm) + uncertainty_weight * scaled(std)
+
+def next_points(surrogate, axes, results, max_replicates, n_points=1, uncertainty_weight=1.0):
+    # Highest scoring lattice points that can still take replicates; a point already run comes
+    # back when its own uncertainty or slope keeps it on top, until it has max_replicates
+    lattice, score = acquisition(surrogate, axes, uncertainty_weight)
+    points = []
+    for i in np.argsort(score)[::-1]:
+        if lattice[i] in results and results[lattice[i]][2] >= max_replicates:
+            continue
+        points.append(lattice[i])
+        if len(points) == n_points:
+            break
+    return points
+
+
+### Running the sweep
+
+def adaptive_sweep(axes, output_dir, budget, blender='blender', coarse_levels=2, uncertainty_weight=1.0,
+                   base_seed=0, min_replicates=3, max_replicates=10, target_ci=None, max_workers=None,
+                   final_frame=800, points_per_round=None):
+    """
+    Runs the coarse grid, then repeatedly fits the surrogate of converged packing fraction and
+    runs the highest scoring lattice points, points_per_round at a time, until the budget is spent.
+    The budget counts Blender runs actually simulated; replicates reused from disk are free.
+    A point picked again gets min_replicates more replicates on top of the ones it has.
+    target_ci applies to the converged packing fraction, the quantity the surrogate is fit to.
+    axes holds the allowed (num_primary_particles, num_aggregates, jump_chance) values.
+    Returns {point: (mean, ci_halfwidth, n_replicates, noise_var)} of the converged packing
+    fraction for every point run, noise_var being the variance of its mean.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if points_per_round is None:
+        points_per_round = max(1, max_workers // min_replicates)  # Enough ensembles to fill the workers
+
+    ensemble_dir = os.path.join(output_dir, 'ensembles')
+    os.makedirs(ensemble_dir, exist_ok=True)
+
+    results = {}
+    spent = 0
+
+    def evaluate(points):
+        # Returns how many points were run; none when the remaining budget cannot cover one
+        nonlocal spent
+        replicate_counts = {}
+        reserved = 0  # Most replicates the points of this round could still simulate
+        for point in points:
+            n_prev = results[point][2] if point in results else 0
+            n_min = n_prev + min_replicates
+            n_max = min(max_replicates, n_prev + budget - spent - reserved)
+            if n_max < min(n_min, max_replicates):
+                continue
+            replicate_counts[point] = (min(n_min, n_max), n_max)
+            reserved += n_max - n_prev
+
+        ensembles = run_ensembles(
+            list(replicate_counts), output_dir, blender, base_seed, target_ci=target_ci,
+            max_workers=max_workers, final_frame=final_frame, replicate_counts=replicate_counts,
+            stop_on='converged',
+        )
+        for (n_primary, n_aggregates, j_chance), ensemble in ensembles.items():
+            name = ensemble_name(n_primary, n_aggregates, j_chance)
+            write_ensemble_csv(os.path.join(ensemble_dir, name + '.csv'), ensemble.stats)
+
+            converged = ensemble.converged
+            spent += ensemble.n_simulated
+            results[(n_primary, n_aggregates, j_chance)] = (
+                converged.mean[0], converged.ci_halfwidth()[0], converged.n_replicates, converged.variance[0] / converged.count[0],
+            )
+            print('{name}: {mean} +/- {ci} ({spent}/{budget} runs)'.format(
+                name=name, mean=converged.mean[0], ci=converged.ci_halfwidth()[0], spent=spent, budget=budget))
+        return len(ensembles)
+
+    grid = coarse_grid(axes, coarse_levels)
+    for i in range(0, len(grid), points_per_round):
+        if not evaluate(grid[i:i + points_per_round]):
+            break
+
+    surrogate = Surrogate()
+    while results and budget - spent >= min_replicates:
+        points = list(results)
+        means = [results[point][0] for point in points]
+        noise_var = [results[point][3] for point in points]
+        surrogate.fit(normalize(points, axes), means, noise_var)
+
+        points = next_points(surrogate, axes, results, max_replicates, points_per_round, uncertainty_weight)
+        if not points or not evaluate(points):  # Every lattice point is at max_replicates, or the budget is spent
+            break
+
+    return results
+
+def write_sweep_csv(csv_filename, results):
+    with open(csv_filename, 'w', newline='') as csvfile:
+        fieldnames = ['num_primary_particles', 'num_aggregates', 'jump_chance', 'n_replicates', 'converged_packing_fraction_mean', 'ci_halfwidth']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        writer.writeheader()
+
+        for (n_primary, n_aggregates, j_chance), (mean, ci_halfwidth, n_replicates, _) in results.items():
+            writer.writerow({
+                'num_primary_particles': n_primary,
+                'num_aggregates': n_aggregates,
+                'jump_chance': j_chance,
+                'n_replicates': n_replicates,
+                'converged_packing_fraction_mean': mean,
+                'ci_halfwidth': ci_halfwidth,
+            })
+
+def main():
+    # CHANGE SETTINGS BELOW TO CHANGE THE SWEEP
+    num_primary_particles = list(range(2, 16))  # Values the scheduler may pick from
+    num_aggregates = list(range(500, 801, 50))
+    jump_chance = [0.25, 0.35, 0.45, 0.55, 0.65, 0.75]
+
+    budget = 150  # Blender runs (replicates) simulated across the whole sweep
+    coarse_levels = 2  # Values per axis in the starting grid (2 = corners of the parameter box)
+    uncertainty_weight = 1.0  # Weight of surrogate uncertainty relative to its gradient when picking points
+
+    blender = 'blender'  # Path to the Blender executable
+    output_dir = r'D:\zachariah_group\packing'
+    base_seed = 0
+    min_replicates = 3
+    max_replicates = 10
+    target_ci = 0.005  # Stop adding replicates to a point once the 95% CI half-width of its converged packing fraction is below this
+    max_workers = os.cpu_count()
+    final_frame = 800  # Must match the frames simulated by parametric_study.py
+    points_per_round = None  # Points run side by side per surrogate update (None = max_workers // min_replicates)
+    # end of changes...
+
+    total_start_time = time.time()
+
+    axes = [num_primary_particles, num_aggregates, jump_chance]
+    results = adaptive_sweep(
+        axes, output_dir, budget, blender, coarse_levels, uncertainty_weight,
+        base_seed, min_replicates, max_replicates, target_ci, max_workers, final_frame, points_per_round,
+    )
+    write_sweep_csv(os.path.join(output_dir, 'ensembles', 'adaptive_sweep.csv'), results)
+
+    print('Total Time: {total_time_hrs} hrs'.format(total_time_hrs=(time.time()-total_start_time)/3600))
+
+if __name__ == "__main__":
+    main()
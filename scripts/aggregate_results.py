@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aggregate_packing.results import update_dataset
+
+def main():
+    # CHANGE SETTINGS BELOW TO POINT AT THE SWEEP OUTPUT
+    results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+    dataset_dir = os.path.join(results_dir, 'dataset')
+    convergence_rtol = 0.01  # Relative band around the final packing fraction that counts as converged
+    # end of changes...
+
+    ingested = update_dataset(results_dir, dataset_dir, convergence_rtol)
+    print('Ingested {n} run(s) into {dataset_dir}'.format(n=len(ingested), dataset_dir=dataset_dir))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import subprocess
+import sys
+import time
+import csv
+import itertools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aggregate_packing.results import converged_packing_fraction, ensemble_name, read_run_csv, run_name
+from aggregate_packing.stats import RunningStats
+
+
+### Launching replicates
+
+# Each replicate is an independent background Blender process running one seeded configuration
+# of parametric_study.py, so replicates can run side by side on a multi-core machine.
+
+def blender_command(blender, n_primary, n_aggregates, j_chance, seed, output_dir, final_frame):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parametric_study.py')
+    return [
+        # Without --python-exit-code Blender exits with 0 even when the script raises
+        blender, '--background', '--python-exit-code', '1', '--python', script, '--',
+        '--num-primary-particles', str(n_primary),
+        '--num-aggregates', str(n_aggregates),
+        '--jump-chance', str(j_chance),
+        '--seed', str(seed),
+        '--output-dir', output_dir,
+        '--final-frame', str(final_frame),
+        '--no-obj',
+    ]
+
+def replicate_csv(output_dir, n_primary, n_aggregates, j_chance, seed):
+    return os.path.join(output_dir, run_name(n_primary, n_aggregates, j_chance, seed) + '.csv')
+
+def count_frames(csv_filename):
+    with open(csv_filename, newline='') as csvfile:
+        return max(sum(1 for _ in csvfile) - 1, 0)  # Minus the header row
+
+def run_replicate(blender, n_primary, n_aggregates, j_chance, seed, output_dir, final_frame):
+    # Returns the replicate's CSV and whether it had to be simulated
+    csv_filename = replicate_csv(output_dir, n_primary, n_aggregates, j_chance, seed)
+    if os.path.exists(csv_filename) and count_frames(csv_filename) == final_frame:
+        return csv_filename, False  # Complete replicates already on disk are reused, not re-simulated
+
+    subprocess.run(
+        blender_command(blender, n_primary, n_aggregates, j_chance, seed, output_dir, final_frame),
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    n_frames = count_frames(csv_filename) if os.path.exists(csv_filename) else 0
+    if n_frames != final_frame:
+        raise RuntimeError('{csv} has {n} frames, expected {final_frame}'.format(csv=csv_filename, n=n_frames, final_frame=final_frame))
+    return csv_filename, True
+
+# stats holds the per-frame packing fraction, converged each replicate's converged packing fraction;
+# failed_seeds lists replicates whose Blender run failed (they count as simulated)
+Ensemble = namedtuple('Ensemble', ['stats', 'converged', 'n_simulated', 'failed_seeds'])
+
+def run_ensemble(n_primary, n_aggregates, j_chance, output_dir, pool, blender='blender', base_seed=0,
+                 min_replicates=3, max_replicates=10, target_ci=None, batch_size=1, final_frame=800,
+                 convergence_rtol=0.01, stop_on='final'):
+    """
+    Runs seeded replicates of one configuration on pool, an executor that may be shared with
+    other configurations, and accumulates their packing fraction online.
+
+    With target_ci set, only min_replicates are started up front. After that at most batch_size
+    replicates are in flight, each started after checking whether the 95% confidence interval
+    half-width is already below target_ci, so no more replicates are simulated than the stopping
+    rule needs. Without it, max_replicates are run. stop_on picks the interval checked: 'final'
+    for the final-frame packing fraction, 'converged' for the converged packing fraction.
+
+    A replicate whose Blender run fails is recorded in failed_seeds and the ensemble carries on
+    with the next seed in its place; failed seeds still count towards max_replicates, so repeated
+    failures cannot loop forever.
+    """
+    stats = RunningStats()
+    converged_stats = RunningStats()
+    n_simulated = 0
+    failed_seeds = []
+    if stop_on not in ('final', 'converged'):
+        raise ValueError("stop_on must be 'final' or 'converged', got {stop_on!r}".format(stop_on=stop_on))
+
+    def converged():
+        if stats.n_replicates < min_replicates:
+            return False
+        if target_ci is None:
+            return stats.n_replicates >= max_replicates
+        if stop_on == 'converged':
+            return converged_stats.ci_halfwidth()[0] < target_ci
+        return stats.ci_halfwidth()[-1] < target_ci
+
+    next_seed = base_seed
+    running = {}  # future -> seed
+    while True:
+        if target_ci is None:
+            n_allowed = max_replicates
+        elif stats.n_replicates < min_replicates:
+            n_allowed = min_replicates
+        else:
+            n_allowed = stats.n_replicates + batch_size
+        n_allowed += len(failed_seeds)  # Failed replicates are replaced by the next seeds
+        while next_seed - base_seed < min(n_allowed, max_replicates) and not converged():
+            future = pool.submit(run_replicate, blender, n_primary, n_aggregates, j_chance, next_seed, output_dir, final_frame)
+            running[future] = next_seed
+            next_seed += 1
+        if not running:
+            break
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            seed = running.pop(future)
+            try:
+                csv_filename, simulated = future.result()
+            except (subprocess.CalledProcessError, RuntimeError) as error:
+                print('Replicate seed {seed} of Np={npp} Na={na} jc={jc} failed: {error}'.format(
+                    seed=seed, npp=n_primary, na=n_aggregates, jc=j_chance, error=error))
+                failed_seeds.append(seed)
+                n_simulated += 1
+                continue
+            n_simulated += simulated
+            packing_fraction = read_run_csv(csv_filename)['packing_fraction']
+            stats.add(packing_fraction)
+            converged_stats.add([converged_packing_fraction(packing_fraction, convergence_rtol)])
+
+    return Ensemble(stats, converged_stats, n_simulated, failed_seeds)
+
+def run_ensembles(configurations, output_dir, blender='blender', base_seed=0, min_replicates=3, max_replicates=10,
+                  target_ci=None, max_workers=None, batch_size=1, final_frame=800, replicate_counts=None,
+                  stop_on='final'):
+    """
+    Runs the ensembles of several (n_primary, n_aggregates, j_chance) configurations at the same
+    time on one pool of max_workers Blender processes. Each ensemble keeps only the replicates
+    that can still change its stopping decision in flight, so the cores are kept busy by running
+    configurations side by side rather than by over-sampling any one of them.
+    replicate_counts optionally maps configurations to their own (min_replicates, max_replicates).
+    stop_on is passed on to run_ensemble.
+    Returns {configuration: Ensemble}.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    configurations = list(configurations)
+    replicate_counts = replicate_counts or {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool, \
+            ThreadPoolExecutor(max_workers=max(len(configurations), 1)) as drivers:
+        futures = {
+            configuration: drivers.submit(
+                run_ensemble, *configuration, output_dir, pool, blender, base_seed,
+                *replicate_counts.get(configuration, (min_replicates, max_replicates)),
+                target_ci, batch_size, final_frame, stop_on=stop_on,
+            )
+            for configuration in configurations
+        }
+        return {configuration: future.result() for configuration, future in futures.items()}
+
+def write_ensemble_csv(csv_filename, stats):
+    with open(csv_filename, 'w', newline='') as csvfile:
+        fieldnames = ['time', 'n_replicates', 'packing_fraction_mean', 'packing_fraction_std', 'ci_halfwidth']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        writer.writeheader()
+
+        ci_halfwidth = stats.ci_halfwidth()
+        for t in range(len(stats.count)):
+            writer.writerow({
+                'time': t,
+                'n_replicates': stats.count[t],
+                'packing_fraction_mean': stats.mean[t],
+                'packing_fraction_std': stats.std[t],
+                'ci_halfwidth': ci_halfwidth[t],
+            })
+
+def main():
+    # CHANGE SETTINGS BELOW TO CHANGE THE ENSEMBLE
+    num_primary_particles = [2, 5, 8, 15]
+    num_aggregates = [500, 650, 800]
+    jump_chance = [0.25, 0.50, 0.75]
+
+    blender = 'blender'  # Path to the Blender executable
+    output_dir = r'D:\zachariah_group\packing'
+    base_seed = 0  # Replicate r of every configuration uses seed base_seed + r
+    min_replicates = 3
+    max_replicates = 20
+    target_ci = 0.005  # Stop adding replicates once the 95% CI half-width of the final packing fraction is below this (None = always max_replicates)
+    max_workers = os.cpu_count()  # Blender processes run at once, shared by all configurations
+    batch_size = 1  # Replicates added per configuration after each confidence interval check
+    final_frame = 800  # Must match the frames simulated by parametric_study.py
+    # end of changes...
+
+    # Kept apart from the replicate CSVs so aggregate_results.py does not ingest them as runs
+    ensemble_dir = os.path.join(output_dir, 'ensembles')
+    os.makedirs(ensemble_dir, exist_ok=True)
+
+    total_start_time = time.time()
+
+    configurations = itertools.product(num_primary_particles, num_aggregates, jump_chance)
+    ensembles = run_ensembles(
+        configurations, output_dir, blender, base_seed, min_replicates, max_replicates,
+        target_ci, max_workers, batch_size, final_frame,
+    )
+
+    for (n_primary, n_aggregates, j_chance), ensemble in ensembles.items():
+        stats = ensemble.stats
+        name = ensemble_name(n_primary, n_aggregates, j_chance)
+        write_ensemble_csv(os.path.join(ensemble_dir, name + '.csv'), stats)
+        print('{name}: {n} replicates ({n_simulated} simulated), final packing fraction {mean} +/- {ci}'.format(
+            name=name, n=stats.n_replicates, n_simulated=ensemble.n_simulated, mean=stats.mean[-1], ci=stats.ci_halfwidth()[-1]))
+        if ensemble.failed_seeds:
+            print('{name}: failed seeds {seeds}'.format(name=name, seeds=ensemble.failed_seeds))
+
+    print('Total Time: {total_time_hrs} hrs'.format(total_time_hrs=(time.time()-total_start_time)/3600))
+
+if __name__ == "__main__":
+    main()
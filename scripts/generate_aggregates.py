@@ -1,65 +1,16 @@
 import bpy
-import random
-import math
-from mathutils import Vector
-import numpy as np
+import os
+import sys
 
-# Delete all existing objects
-def delete_all_objects():
-    bpy.ops.object.select_all(action='SELECT')
-    bpy.ops.object.delete(use_global=False)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))  # Blender's Python does not see the package otherwise
 
-# Create a UV sphere
-def create_sphere(location, radius=1):
-    bpy.ops.mesh.primitive_uv_sphere_add(radius=radius, location=location)
-    sphere = bpy.context.object
-
-    # Apply Subdivision Surface modifier
-#    bpy.ops.object.modifier_add(type='SUBSURF')
-#    sphere.modifiers["Subdivision"].levels = 2
-#    sphere.modifiers["Subdivision"].render_levels = 2
-#    bpy.ops.object.shade_smooth()
-    
-    return sphere
-
-# Generate a random unit vector
-def random_unit_vector():
-    theta = random.uniform(0, 2 * math.pi)
-    phi = random.uniform(0, math.pi)
-    x = math.sin(phi) * math.cos(theta)
-    y = math.sin(phi) * math.sin(theta)
-    z = math.cos(phi)
-    return Vector((x, y, z))
-
-# Find a new position for a sphere in the aggregate
-def find_new_position(positions, radius):
-    while True:
-        base_pos = random.choice(positions)
-        direction = random_unit_vector()
-        new_pos = base_pos + direction * 2 * radius
-        no_overlap = all((new_pos - pos).length >= 2 * radius for pos in positions)
-        if no_overlap:
-            return new_pos
+from aggregate_packing import blender
+from aggregate_packing.geometry import aggregate_positions, distribute_on_sphere
 
 # Create an aggregate of spheres
 def create_aggregate(center, radius, num_spheres):
-    positions = [center]
-    spheres = [create_sphere(center, radius)]
-
-    for _ in range(1, num_spheres):
-        new_pos = find_new_position(positions, radius)
-        spheres.append(create_sphere(new_pos, radius))
-        positions.append(new_pos)
-
-    # Join all spheres into one mesh
-    bpy.ops.object.select_all(action='DESELECT')
-    for sphere in spheres:
-        sphere.select_set(True)
-    
-    bpy.context.view_layer.objects.active = spheres[0]
-    bpy.ops.object.join()
-    
-    aggregate = bpy.context.active_object
+    positions = aggregate_positions(center, radius, num_spheres)  # Each sphere grows from a random earlier one
+    aggregate = blender.join_spheres(positions, radius)
 
     # Add rigid body physics to the aggregate
     bpy.ops.rigidbody.object_add()
@@ -72,25 +23,11 @@ def create_aggregate(center, radius, num_spheres):
     aggregate.rigid_body.angular_damping = 1 # How much rotational velocity slows over time (increase = faster)
     aggregate.rigid_body.use_margin = True
     
-#    for obj in bpy.context.scene.objects:
-#        if obj.type == 'SPHERE':
-#            obj.scale = (radius, radius, radius)
-    
     return aggregate
 
-# Distribute positions on a sphere
-def distribute_on_sphere(n, r):
-    indices = np.arange(0, n, dtype=float) + 0.5
-    phi = (np.sqrt(5.0) - 1.0) / 2.0  # golden ratio
-    y = 2*r * (1 - (indices / n)) - r  # y varies from -r to r
-    radius = np.sqrt(r*r - y*y)  # radius at y
-    theta = 2 * np.pi * phi * indices
-    x, z = radius * np.cos(theta), radius * np.sin(theta)
-    return list(zip(x, y, z))  # return as a list of tuples
-
 # Main script execution
 def main():
-    delete_all_objects() # Deletes all the objects
+    blender.delete_all_objects() # Deletes all the objects
 
     scale_factor = 0.01  # Conversion factor for meters -> millimeters
 
@@ -104,15 +41,14 @@ def main():
     aggregate_locations = distribute_on_sphere(num_aggregates, initial_placement_radius)
 
     for location in aggregate_locations:
-        create_aggregate(Vector(location), primary_particle_radius, num_primary_particles)
+        create_aggregate(location, primary_particle_radius, num_primary_particles)
     
     # Set up the scene's gravity and force field
     bpy.context.scene.gravity = (0, 0, 0)  # No gravity
     bpy.context.scene.rigidbody_world.time_scale = 50  # Adjusts the speed of the simulation relative to real time
 
     # Create and configure the force field at the center
-    center_point = Vector((0, 0, 0))
-    bpy.ops.object.effector_add(type='FORCE', location=center_point)
+    bpy.ops.object.effector_add(type='FORCE', location=(0, 0, 0))
     force_field = bpy.context.object
     force_field.field.strength = -100.0 * scale_factor  # Increase the strength
     force_field.field.falloff_type = 'SPHERE'
@@ -0,0 +1,99 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import ensemble_study
+from adaptive_sweep import Surrogate, adaptive_sweep
+from ensemble_study import count_frames, replicate_csv
+
+FINAL_FRAME = 5
+
+
+def packing_fraction(n_primary, n_aggregates, j_chance):
+    # Smooth synthetic response over the parameter box
+    return 0.3 + 0.01 * n_primary - 0.1 * j_chance + 1e-5 * n_aggregates
+
+
+class FakeReplicates:
+    """
+    Stands in for ensemble_study.run_replicate: reuses complete CSVs already on disk like the real
+    one, otherwise writes a synthetic replicate and counts it as simulated.
+    """
+
+    def __init__(self, noise=1e-4):
+        self.noise = noise
+        self.simulated = 0
+        self.lock = threading.Lock()
+
+    def write(self, n_primary, n_aggregates, j_chance, seed, output_dir):
+        csv_filename = replicate_csv(output_dir, n_primary, n_aggregates, j_chance, seed)
+        value = packing_fraction(n_primary, n_aggregates, j_chance) + self.noise * np.random.default_rng(seed).standard_normal()
+        with open(csv_filename, 'w', newline='') as csvfile:
+            csvfile.write('time,aggregate_volume,bounding_radius,packing_fraction\n')
+            for t in range(FINAL_FRAME):
+                csvfile.write('{t},1.0,1.0,{value}\n'.format(t=t, value=value))
+        return csv_filename
+
+    def __call__(self, blender, n_primary, n_aggregates, j_chance, seed, output_dir, final_frame):
+        csv_filename = replicate_csv(output_dir, n_primary, n_aggregates, j_chance, seed)
+        if os.path.exists(csv_filename) and count_frames(csv_filename) == final_frame:
+            return csv_filename, False
+        with self.lock:
+            self.simulated += 1
+        return self.write(n_primary, n_aggregates, j_chance, seed, output_dir), True
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    replicates = FakeReplicates()
+    monkeypatch.setattr(ensemble_study, 'run_replicate', replicates)
+    return replicates
+
+
+def sweep(output_dir, axes, budget, **kwargs):
+    kwargs = {'min_replicates': 2, 'max_replicates': 6, 'target_ci': 1.0, 'max_workers': 4,
+              'final_frame': FINAL_FRAME, 'points_per_round': 2, **kwargs}
+    return adaptive_sweep(axes, str(output_dir), budget, **kwargs)
+
+
+def test_spent_stays_within_budget(tmp_path, fake):
+    axes = [[2, 4, 6, 8], [500, 600, 700], [0.25, 0.5, 0.75]]
+    results = sweep(tmp_path, axes, budget=21, points_per_round=3)
+    assert fake.simulated <= 21
+    assert sum(n_replicates for _, _, n_replicates, _ in results.values()) == fake.simulated
+
+
+def test_reused_replicates_are_not_charged(tmp_path, fake):
+    axes = [[2, 5], [500], [0.25]]
+    for point in [(2, 500, 0.25), (5, 500, 0.25)]:
+        for seed in range(2):
+            fake.write(*point, seed, str(tmp_path))
+
+    results = sweep(tmp_path, axes, budget=2)
+    # Both coarse points come from disk for free, leaving the budget for one revisit
+    assert fake.simulated == 2
+    assert sorted(n_replicates for _, _, n_replicates, _ in results.values()) == [2, 4]
+
+
+def test_revisited_point_gets_more_replicates(tmp_path, fake):
+    axes = [[2, 5], [500], [0.25]]
+    results = sweep(tmp_path, axes, budget=6)
+    assert fake.simulated == 6
+    assert sorted(n_replicates for _, _, n_replicates, _ in results.values()) == [2, 4]
+
+
+def test_stops_once_every_point_is_at_max_replicates(tmp_path, fake):
+    axes = [[2, 5], [500], [0.25]]
+    results = sweep(tmp_path, axes, budget=100)
+    assert [n_replicates for _, _, n_replicates, _ in results.values()] == [6, 6]
+    assert fake.simulated == 12
+
+
+def test_surrogate_reproduces_low_noise_training_points():
+    x = np.array([[a, b] for a in np.linspace(0, 1, 4) for b in np.linspace(0, 1, 3)])
+    y = 0.3 + 0.1 * np.sin(3 * x[:, 0]) + 0.05 * x[:, 1]
+    mean, std = Surrogate().fit(x, y, np.full(len(y), 1e-10)).predict(x)
+    np.testing.assert_allclose(mean, y, atol=1e-4)
+    assert np.all(std < 1e-2)
@@ -0,0 +1,134 @@
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import ensemble_study
+from ensemble_study import replicate_csv, run_ensemble, run_ensembles
+
+
+class FakeReplicates:
+    """
+    Stands in for ensemble_study.run_replicate: writes a synthetic replicate CSV whose packing
+    fraction is level + noise * N(0, 1) per seed, and records how many run at once.
+    """
+
+    def __init__(self, level=0.3, noise=0.01, final_frame=5, failing_seeds=(), short_seeds=()):
+        self.level, self.noise, self.final_frame = level, noise, final_frame
+        self.failing_seeds, self.short_seeds = set(failing_seeds), set(short_seeds)
+        self.seeds = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, blender, n_primary, n_aggregates, j_chance, seed, output_dir, final_frame):
+        with self.lock:
+            self.seeds.append((n_primary, n_aggregates, j_chance, seed))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.01)
+            if seed in self.failing_seeds:
+                raise subprocess.CalledProcessError(1, [blender])
+            if seed in self.short_seeds:
+                raise RuntimeError('replicate came back short')
+            csv_filename = replicate_csv(output_dir, n_primary, n_aggregates, j_chance, seed)
+            value = self.level + self.noise * np.random.default_rng(seed).standard_normal()
+            with open(csv_filename, 'w', newline='') as csvfile:
+                csvfile.write('time,aggregate_volume,bounding_radius,packing_fraction\n')
+                for t in range(self.final_frame):
+                    csvfile.write('{t},1.0,1.0,{value}\n'.format(t=t, value=value))
+            return csv_filename, True
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    replicates = FakeReplicates()
+    monkeypatch.setattr(ensemble_study, 'run_replicate', replicates)
+    return replicates
+
+
+def ensemble(output_dir, max_workers=16, **kwargs):
+    os.makedirs(str(output_dir), exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return run_ensemble(5, 500, 0.25, str(output_dir), pool, **kwargs)
+
+
+def test_without_target_runs_max_replicates(tmp_path, fake):
+    result = ensemble(tmp_path, min_replicates=3, max_replicates=7)
+    assert result.stats.n_replicates == result.n_simulated == 7
+    assert result.converged.n_replicates == 7
+    assert result.failed_seeds == []
+
+
+def test_met_target_stops_at_min_replicates(tmp_path, fake):
+    fake.noise = 1e-6
+    result = ensemble(tmp_path, min_replicates=3, max_replicates=10, target_ci=0.01)
+    assert result.stats.n_replicates == 3
+    assert len(fake.seeds) == 3  # Nothing beyond the first check was launched, despite idle workers
+
+
+def test_unmet_target_stops_at_max_replicates(tmp_path, fake):
+    fake.noise = 0.1
+    result = ensemble(tmp_path, min_replicates=3, max_replicates=6, target_ci=1e-9)
+    assert result.stats.n_replicates == 6
+    assert len(fake.seeds) == 6
+
+
+def test_in_flight_replicates_are_bounded(tmp_path, fake):
+    fake.noise = 0.1
+    ensemble(tmp_path, min_replicates=3, max_replicates=12, target_ci=1e-9, batch_size=2)
+    assert fake.max_in_flight <= 3
+
+    fake.max_in_flight = 0
+    ensemble(tmp_path / 'batch', min_replicates=2, max_replicates=12, target_ci=1e-9, batch_size=4)
+    assert fake.max_in_flight <= 4
+
+
+def test_failed_replicates_are_recorded_and_replaced(tmp_path, fake):
+    fake.failing_seeds, fake.short_seeds = {1}, {2}
+    result = ensemble(tmp_path, min_replicates=3, max_replicates=10, target_ci=1.0)
+    assert sorted(result.failed_seeds) == [1, 2]
+    assert result.stats.n_replicates == 3  # Seeds 3 and 4 stood in for the failures
+    assert result.n_simulated == 5
+
+
+def test_failed_replicates_count_towards_max_replicates(tmp_path, fake):
+    fake.failing_seeds = set(range(10))
+    result = ensemble(tmp_path, min_replicates=3, max_replicates=4, target_ci=0.01)
+    assert sorted(result.failed_seeds) == [0, 1, 2, 3]
+    assert result.stats.n_replicates == 0
+
+
+def test_run_ensembles_keeps_other_configurations_when_one_fails(tmp_path, monkeypatch):
+    fake = FakeReplicates()
+
+    def run_replicate(blender, n_primary, *args):
+        if n_primary == 2:
+            raise subprocess.CalledProcessError(1, [blender])
+        return fake(blender, n_primary, *args)
+
+    monkeypatch.setattr(ensemble_study, 'run_replicate', run_replicate)
+    ensembles = run_ensembles(
+        [(2, 500, 0.25), (5, 500, 0.25)], str(tmp_path), min_replicates=2, max_replicates=3, max_workers=4,
+        final_frame=fake.final_frame,
+    )
+    assert sorted(ensembles[(2, 500, 0.25)].failed_seeds) == [0, 1, 2]
+    assert ensembles[(5, 500, 0.25)].stats.n_replicates == 3
+    assert os.path.exists(replicate_csv(str(tmp_path), 5, 500, 0.25, 0))
+
+
+def test_stop_on_converged_packing_fraction(tmp_path, fake):
+    fake.noise = 1e-6
+    result = ensemble(tmp_path, min_replicates=3, max_replicates=10, target_ci=0.01, stop_on='converged')
+    assert result.converged.n_replicates == 3
+    assert result.converged.ci_halfwidth()[0] < 0.01
+    with pytest.raises(ValueError):
+        ensemble(tmp_path, target_ci=0.01, stop_on='median')
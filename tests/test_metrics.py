@@ -0,0 +1,37 @@
+import random
+
+import numpy as np
+
+from aggregate_packing.geometry import aggregate_positions
+from aggregate_packing.metrics import bounding_sphere, mesh_volume, packing_fraction, sphere_volume
+
+CUBE_VERTICES = np.array([
+    [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+    [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1],
+], dtype=float)
+CUBE_TRIANGLES = [
+    [0, 2, 1], [0, 3, 2], [4, 5, 6], [4, 6, 7], [0, 1, 5], [0, 5, 4],
+    [2, 3, 7], [2, 7, 6], [1, 2, 6], [1, 6, 5], [0, 4, 7], [0, 7, 3],
+]
+
+
+def test_mesh_volume_of_closed_cube():
+    assert np.isclose(mesh_volume(CUBE_VERTICES * 2, CUBE_TRIANGLES), 8.0)
+    # Independent of where the mesh sits
+    assert np.isclose(mesh_volume(CUBE_VERTICES * 2 + [5, -3, 1], CUBE_TRIANGLES), 8.0)
+
+
+def test_bounding_sphere_and_packing_fraction():
+    center, radius = bounding_sphere([[1, 0, 0], [-1, 0, 0], [0, 2, 0]])
+    np.testing.assert_allclose(center, [0, 1, 0])
+    assert np.isclose(radius, np.sqrt(2))
+    assert np.isclose(packing_fraction(sphere_volume(1), 2), 1 / 8)
+
+
+def test_aggregate_positions_are_seeded_and_touching():
+    first = aggregate_positions((0, 0, 0), 1, 8, 0.5, random.Random(3))
+    second = aggregate_positions((0, 0, 0), 1, 8, 0.5, random.Random(3))
+    np.testing.assert_allclose(first, second)
+
+    distances = [np.linalg.norm(a - b) for i, a in enumerate(first) for b in first[i + 1:]]
+    assert min(distances) >= 2 - 1e-9
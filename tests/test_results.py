@@ -0,0 +1,131 @@
+import json
+import os
+
+import numpy as np
+
+from aggregate_packing.results import (
+    convergence_frame, ensemble_name, load_dataset, load_run_summaries, parse_run_name, run_name, update_dataset,
+)
+
+
+def write_run(results_dir, name, packing_fraction, column='packing_fraction'):
+    with open(os.path.join(results_dir, name + '.csv'), 'w', newline='') as csvfile:
+        csvfile.write('time,aggregate_volume,bounding_radius,{column}\n'.format(column=column))
+        for t, value in enumerate(packing_fraction):
+            csvfile.write('{t},1.0,1.0,{value}\n'.format(t=t, value=value))
+
+
+def test_convergence_frame():
+    packing_fraction = np.array([0.1, 0.2, 0.29, 0.35, 0.301, 0.299, 0.3])
+    assert convergence_frame(packing_fraction, rtol=0.01) == 4
+    assert convergence_frame(np.full(5, 0.3)) == 0
+    assert convergence_frame(np.array([])) == -1
+
+
+def test_run_name_round_trip():
+    params = parse_run_name(run_name(5, 500, 0.25, seed=3))
+    assert run_name(5, 500, 0.25, seed=3) == 'aggregate_data_Np_5_Na_500_jc0p25_seed3'
+    assert ensemble_name(5, 500, 0.25) == 'ensemble_Np_5_Na_500_jc0p25'
+    assert (params['num_primary_particles'], params['num_aggregates'], params['jump_chance'], params['seed']) == (5, 500, 0.25, 3)
+    assert np.isnan(parse_run_name(run_name(5, 500, 0.25))['seed'])
+    assert parse_run_name('0.01radius_5particles_50aggregates')['primary_particle_radius'] == 0.01
+
+
+def test_update_dataset_reingests_only_changed_runs(tmp_path):
+    results_dir, dataset_dir = str(tmp_path), str(tmp_path / 'dataset')
+    write_run(results_dir, run_name(5, 500, 0.25, 0), [0.1, 0.3, 0.3])
+    write_run(results_dir, run_name(5, 500, 0.25, 1), [0.1, 0.5, 0.5])
+
+    assert len(update_dataset(results_dir, dataset_dir)) == 2
+    assert update_dataset(results_dir, dataset_dir) == []
+
+    write_run(results_dir, run_name(5, 500, 0.25, 1), [0.1, 0.2, 0.4, 0.4])
+    os.utime(os.path.join(results_dir, run_name(5, 500, 0.25, 1) + '.csv'), (1, 1))
+    assert update_dataset(results_dir, dataset_dir) == [run_name(5, 500, 0.25, 1)]
+
+    columns = load_dataset(dataset_dir)
+    assert all(len(values) == 7 for values in columns.values())
+    summaries = load_run_summaries(dataset_dir)
+    assert [summary['n_replicates'] for summary in summaries] == [2, 2]
+    assert np.isclose(summaries[0]['replicate_mean'], 0.35)
+
+    # Deleted runs leave the dataset and the replicate statistics
+    os.remove(os.path.join(results_dir, run_name(5, 500, 0.25, 0) + '.csv'))
+    update_dataset(results_dir, dataset_dir)
+    assert len(load_dataset(dataset_dir)['time']) == 4
+    assert [summary['n_replicates'] for summary in load_run_summaries(dataset_dir)] == [1]
+
+
+def test_update_dataset_normalises_percentages(tmp_path):
+    results_dir, dataset_dir = str(tmp_path), str(tmp_path / 'dataset')
+    write_run(results_dir, '0.01radius_5particles_50aggregates', [30.0, 37.0], column='packing_percentage')
+    write_run(results_dir, '0.01radius_8particles_50aggregates', [30.0, 37.0])  # Older percentage output
+    update_dataset(results_dir, dataset_dir)
+
+    summaries = load_run_summaries(dataset_dir)
+    assert np.allclose([summary['final_packing_fraction'] for summary in summaries], 0.37)
+    assert np.allclose(load_dataset(dataset_dir)['packing_fraction'], [0.30, 0.37, 0.30, 0.37])
+
+
+def test_update_dataset_rebuilds_outdated_schema(tmp_path):
+    results_dir, dataset_dir = str(tmp_path), str(tmp_path / 'dataset')
+    write_run(results_dir, '0.01radius_5particles_50aggregates', [30.0, 37.0], column='packing_percentage')
+    update_dataset(results_dir, dataset_dir)
+
+    # Rewrite the manifest in the unversioned layout used before the seed column existed
+    manifest_filename = os.path.join(dataset_dir, 'manifest.json')
+    with open(manifest_filename) as f:
+        files = json.load(f)['files']
+    with open(manifest_filename, 'w') as f:
+        json.dump(files, f)
+    np.save(os.path.join(dataset_dir, 'frames', 'seed.npy'), np.zeros(0))
+
+    write_run(results_dir, run_name(5, 500, 0.25, 0), [0.2, 0.3])
+    update_dataset(results_dir, dataset_dir)
+
+    columns = load_dataset(dataset_dir)
+    assert all(len(values) == 4 for values in columns.values())
+    summaries = {summary['run_id']: summary for summary in load_run_summaries(dataset_dir)}
+    assert np.isclose(summaries['0.01radius_5particles_50aggregates']['final_packing_fraction'], 0.37)
+
+
+def test_interrupted_update_leaves_dataset_consistent(tmp_path, monkeypatch):
+    results_dir, dataset_dir = str(tmp_path), str(tmp_path / 'dataset')
+    write_run(results_dir, run_name(5, 500, 0.25, 0), [0.1, 0.3, 0.3])
+    update_dataset(results_dir, dataset_dir)
+
+    # Fail after the first column of the next update has been written
+    write_run(results_dir, run_name(5, 500, 0.25, 1), [0.1, 0.5, 0.5])
+    save = np.save
+    calls = []
+    def failing_save(*args, **kwargs):
+        calls.append(args)
+        if len(calls) > 1:
+            raise KeyboardInterrupt
+        save(*args, **kwargs)
+    monkeypatch.setattr(np, 'save', failing_save)
+    try:
+        update_dataset(results_dir, dataset_dir)
+    except KeyboardInterrupt:
+        pass
+    monkeypatch.setattr(np, 'save', save)
+
+    assert all(len(values) == 3 for values in load_dataset(dataset_dir).values())
+    assert len(update_dataset(results_dir, dataset_dir)) == 1
+    assert all(len(values) == 6 for values in load_dataset(dataset_dir).values())
+    assert not os.path.exists(dataset_dir + '.tmp')
+
+
+def test_update_dataset_recovers_from_interrupted_swap(tmp_path):
+    results_dir, dataset_dir = str(tmp_path), str(tmp_path / 'dataset')
+    write_run(results_dir, run_name(5, 500, 0.25, 0), [0.1, 0.3, 0.3])
+    update_dataset(results_dir, dataset_dir)
+
+    # Interrupted between parking the previous copy and moving the new one in
+    os.rename(dataset_dir, dataset_dir + '.old')
+    assert len(load_dataset(dataset_dir)['time']) == 3
+
+    write_run(results_dir, run_name(5, 500, 0.25, 1), [0.1, 0.5, 0.5])
+    assert update_dataset(results_dir, dataset_dir) == [run_name(5, 500, 0.25, 1)]
+    assert len(load_dataset(dataset_dir)['time']) == 6
+    assert not os.path.exists(dataset_dir + '.old')
@@ -0,0 +1,35 @@
+import numpy as np
+
+from aggregate_packing.stats import RunningStats, t_quantile_95
+
+
+def test_running_stats_matches_batch_statistics():
+    rng = np.random.default_rng(0)
+    trajectories = rng.normal(0.3, 0.02, size=(7, 50))
+    stats = RunningStats()
+    for trajectory in trajectories:
+        stats.add(trajectory)
+
+    assert stats.n_replicates == 7
+    np.testing.assert_allclose(stats.mean, trajectories.mean(axis=0))
+    np.testing.assert_allclose(stats.variance, np.var(trajectories, axis=0, ddof=1))
+
+
+def test_running_stats_shorter_replicate_leaves_later_frames_untouched():
+    stats = RunningStats()
+    stats.add([1.0, 2.0, 3.0])
+    stats.add([3.0, 4.0])
+
+    np.testing.assert_array_equal(stats.count, [2, 2, 1])
+    np.testing.assert_allclose(stats.mean, [2.0, 3.0, 3.0])
+    assert np.isnan(stats.variance[-1])
+
+
+def test_ci_halfwidth_uses_student_t():
+    stats = RunningStats()
+    for value in [1.0, 2.0, 3.0]:
+        stats.add([value])
+
+    # 3 replicates: t with 2 degrees of freedom, std 1
+    np.testing.assert_allclose(stats.ci_halfwidth(), [4.303 / np.sqrt(3)])
+    np.testing.assert_allclose(t_quantile_95(np.array([1, 30, 1000])), [12.706, 2.042, 1.96237], atol=1e-4)